@@ -1,16 +1,180 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import zipfile
-import io
+import shutil
+import base64
+import csv
+import random
 import time
 import os
 import json
+import secrets
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from types import MappingProxyType
+import numpy as np
 import pandas as pd
-import uuid
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; usa o json da stdlib na ausência
+    orjson = None
+
+# Logger do módulo: formatação preguiçosa (%) só roda se houver handler
+logger = logging.getLogger(__name__)
+
+# Timeout padrão (conexão, leitura) de toda chamada HTTP: um servidor
+# travado falha em segundos em vez de prender o processo indefinidamente.
+# A leitura é generosa porque o download em streaming zera o relógio a
+# cada bloco recebido
+_TIMEOUT = (10, 60)
+
+# Cache de tokens por (ambiente, username): instâncias diferentes — em
+# especial as funções de conveniência, que criam uma por chamada —
+# compartilham o mesmo login enquanto o token for válido
+_token_cache = {}
+_token_lock = threading.Lock()
+
+
+def _json_loads(response):
+    """Decodifica o corpo JSON de uma resposta (orjson quando disponível)"""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+def _json_dumps(payload):
+    """Serializa um payload para bytes JSON (orjson quando disponível)"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload).encode('utf-8')
+
+# Tabela de tradução que apaga todo caractere Latin-1 que não é dígito
+# (cobre NBSP e afins): uma única chamada em C substitui o filtro
+# caractere a caractere do cpf_validator
+_NAO_DIGITOS = str.maketrans('', '', ''.join(chr(c) for c in range(256)
+                                             if not '0' <= chr(c) <= '9'))
+
+# Pesos dos dígitos verificadores do CPF (constantes, calculadas uma vez)
+_CPF_PESOS_1 = (10, 9, 8, 7, 6, 5, 4, 3, 2)
+_CPF_PESOS_2 = (11, 10, 9, 8, 7, 6, 5, 4, 3, 2)
+_CPF_PESOS_NP1 = np.array(_CPF_PESOS_1, dtype=np.int32)
+_CPF_PESOS_NP2 = np.array(_CPF_PESOS_2, dtype=np.int32)
+
+# Alfabeto da codificação em base 36
+_BASE36_ALFABETO = '0123456789abcdefghijklmnopqrstuvwxyz'
+# Tabela de pares de dígitos (36² = 1296 entradas): cada divmod do loop de
+# codificação produz dois caracteres, metade das iterações
+_BASE36_PARES = tuple(_BASE36_ALFABETO[i // 36] + _BASE36_ALFABETO[i % 36]
+                      for i in range(1296))
+
+# Código de layout usado na URL de campos-formulario, por formulário
+_LAYOUT_MAP = MappingProxyType({
+    'L185': '185',
+    'L062': '185',
+    'L005': '005',
+    'L009': '009',
+    'L204': '204',
+    'L008': '008',
+    'L021': '021',
+    'L010': '010'
+})
+
+# Configurações específicas de cada formulário conhecido, construídas uma
+# única vez na importação (exportar_payload apenas as consulta)
+def _config_formulario(codigo, nome, n_colunas, servico_id, servico_nome,
+                       referencia, layout_codigo, layout_id):
+    """Monta a entrada de configuração de um formulário conhecido"""
+    return {
+        "servico": {"id": servico_id, "nome": servico_nome},
+        "formulario": {"codigo": codigo, "nome": nome},
+        "layout": {"codigo": layout_codigo, "id": layout_id,
+                   "idServico": servico_id, "nomeServico": servico_nome,
+                   "referenciaServico": referencia},
+        # range é preguiçoso: só vira lista no momento de montar o payload
+        "colunas": range(1, n_colunas + 1)
+    }
+
+
+_FORMULARIOS_CONFIG = MappingProxyType({
+    'L185': _config_formulario('L185', 'Leiaute de Usuário - v3',
+                               71, 15, 'US', 'REPOSITÓRIO DE USUÁRIOS', 185, 170),
+    'L062': _config_formulario('L062', 'Leiaute de Controle de usuários e pontos de entrega.',
+                               15, 15, 'US', 'REPOSITÓRIO DE USUÁRIOS', '062', 190),
+    'L204': _config_formulario('L204', 'Leiaute de Instrumento',
+                               41, 6, 'IN', 'REPOSITÓRIO DE INSTRUMENTOS', '204', 173),
+    'L005': _config_formulario('L005', 'Leiaute de base planejada',
+                               116, 1, 'DA', 'REPOSITÓRIO DE DADOS', '005', 5),
+    'L009': _config_formulario('L009', 'Leiaute de sujeito',
+                               97, 3, 'SU', 'REPOSITÓRIO DE SUJEITOS', '009', 9),
+    'L008': _config_formulario('L008', 'Leiaute de decodificação',
+                               226, 1, 'DA', 'REPOSITÓRIO DE DADOS', '008', 8),
+    'L021': _config_formulario('L021', 'Leiaute de solicitação de verificação',
+                               26, 10, 'SO', 'REPOSITÓRIO DE SOLICITAÇÃO', '021', 17),
+    'L010': _config_formulario('L010', 'Leiaute de solicitação de recodificação',
+                               26, 10, 'SO', 'REPOSITÓRIO DE SOLICITAÇÃO', '010', 148)
+})
+
+# Sub-estruturas constantes do payload de exportação, compartilhadas entre
+# chamadas (a serialização apenas as lê, nunca as modifica)
+_FONTE_DADO_TIPO = {"id": 2, "codigo": 2}
+_PROGRAMA_TIPO = {"id": 2, "codigo": 2}
+_GRUPO_ADM = {"id": 1, "descricao": "ADM", "ativo": True}
+# Sentinela para exportações sem filtro (o caso comum): evita alocar uma
+# lista vazia nova a cada payload. Tupla para ser imutável — o
+# serializador JSON a emite como array do mesmo jeito
+_FILTRO_VAZIO = ()
+_SERVICO_AD = {"id": 13, "nome": "AD",
+               "referenciaServico": "REPOSITÓRIO DE DADOS ADMINISTRATIVOS",
+               "instanciaServico": "REPOSITORIO_DADO_ADMINISTRATIVO"}
+_LAYOUT_AD = {"codigo": "055", "nome": "Leiaute de dado administrativo",
+              "id": 125, "idServico": 13, "nomeServico": "AD",
+              "referenciaServico": "REPOSITORIO_DADOS_ADMINISTRATIVOS"}
+
+# fileNames por formulário (pré-separado da config para não precisar
+# filtrar a chave a cada chamada). Tuplas pelo mesmo motivo de
+# _FILTRO_VAZIO: os valores entram no payload devolvido ao chamador
+_FILE_NAMES_CONFIG = MappingProxyType({
+    'L005': ("", ""),
+    'L009': ("", ""),
+    'L008': ("", ""),
+    'L021': ("", ""),
+    'L010': ("", "")
+})
+
+# Formulários especiais com código fixo: (codigo_form, partial_name). As
+# colunas desses leiautes vêm de _FORMULARIOS_CONFIG na montagem do payload.
+# 'USUARIO' é o único com nome parcial dinâmico e é tratado à parte.
+_FORMULARIOS_ESPECIAIS = MappingProxyType({
+    'APP_LOGISTICA': ('L062', 'APP_LOGISTICA'),
+    'L005': ('L005', 'L005'),
+    'L009': ('L009', 'L009'),
+    'L204': ('L204', 'L204'),
+    'L008': ('L008', 'L008'),
+    'L021': ('L021', 'L021'),
+    'L010': ('L010', 'L010')
+})
+
+# Sufixo do nome do ZIP baixado para os leiautes fixos
+_ZIP_SUFFIX_BY_FORM = MappingProxyType({
+    'L005': 'L005',
+    'L009': 'L009',
+    'L204': 'L204',
+    'L008': 'L008',
+    'L021': 'L021',
+    'L010': 'L010'
+})
+
 
 class RepoLink:
     """Classe unificada para acesso aos repositórios Central e CPD"""
-    
+
+    # Cache do cadastro de acesso: {caminho: (mtime, linhas)}
+    _cred_cache = {}
+
     def __init__(self, ambiente='central'):
         """
         Inicializa a classe com o ambiente especificado.
@@ -20,8 +184,50 @@ class RepoLink:
         """
         self.ambiente = ambiente.lower()
         self.configurar_ambiente()
+        self._token_expiry = 0
+        self._retry_after = None
+
+        # Cache das consultas de campos-formulario: a mesma resposta serve
+        # pegar_colunas e cat_nm_campo para o mesmo formulário
+        self._campos_cache = {}
+
+        # Sessão com pool de conexões: reutiliza a conexão TCP/TLS entre as
+        # chamadas (o loop de polling sozinho faz ~120 requisições)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16,
+                              max_retries=Retry(total=3, backoff_factor=0.5,
+                                                status_forcelist=[502, 503, 504]))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Content-Type': 'application/json'})
+
         self.bearer = None
-        
+
+    @property
+    def bearer(self):
+        """Token de autenticação atual"""
+        return self._bearer
+
+    @bearer.setter
+    def bearer(self, valor):
+        # Mantém o header Authorization da sessão sincronizado com o token,
+        # em vez de remontar um dict de headers a cada requisição
+        self._bearer = valor
+        if valor:
+            self.session.headers['Authorization'] = f'Bearer {valor}'
+        else:
+            self.session.headers.pop('Authorization', None)
+
+    def close(self):
+        """Encerra a sessão HTTP e devolve as conexões do pool"""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def configurar_ambiente(self):
         """Configura URLs e nomes de arquivos baseado no ambiente"""
         if self.ambiente == 'central':
@@ -32,29 +238,95 @@ class RepoLink:
             self.acesso_file = 'acesso_cpd.csv'
         else:
             raise ValueError("Ambiente deve ser 'central' ou 'cpd'")
+
+        # URLs absolutas dos endpoints fixos, montadas uma única vez
+        # (as URLs parametrizadas por formulário continuam com f-string)
+        self.url_login = f"{self.base_url}/gw/login/auth/login"
+        self.url_historico = f"{self.base_url}/gw/repositorio/historico"
+        self.url_total_items = f"{self.base_url}/gw/repositorio/historico/totalItems"
+        self.url_solicitar_exportacao = f"{self.base_url}/gw/repositorio/download/solicitarExportacao"
     
-    def pegar_colunas(self, subprograma, codigo_form):
-        """Obtém a lista de colunas de um formulário"""
-        url = f'{self.base_url}/gw/formulario/formulario/download/campos-formulario/{subprograma}/{codigo_form}/055'
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {self.bearer}'
-        }
+    def _arquivo_acesso(self):
+        """Caminho completo do arquivo de acesso do ambiente"""
+        caminho_diretorio = os.path.dirname(os.path.abspath(__file__))
+        return os.path.join(caminho_diretorio, self.acesso_file)
+
+    def _load_credentials(self):
+        """
+        Lê o cadastro de acesso uma única vez e memoiza.
 
-        response = requests.get(url, headers=headers)
+        Relê apenas quando o mtime do arquivo muda; usa csv.DictReader,
+        bem mais leve que pd.read_csv para um arquivo de uma linha.
+        """
+        caminho = self._arquivo_acesso()
+        mtime = os.stat(caminho).st_mtime
+        cache = RepoLink._cred_cache.get(caminho)
+        if cache is not None and cache[0] == mtime:
+            return cache[1]
 
-        if response.status_code == 200:
-            data = response.json()
-            colunas = []
-            
-            for campo in data['camposFormularios']:
-                ordem = campo['ordem']
-                colunas.append(ordem)
-            
-            return colunas
-        else:
-            print(f'Erro ao fazer a requisição: {response.status_code}')
+        with open(caminho, newline='') as f:
+            linhas = list(csv.DictReader(f))
+        RepoLink._cred_cache[caminho] = (mtime, linhas)
+        return linhas
+
+    def _get_json(self, url, **kwargs):
+        """
+        GET que devolve o corpo JSON decodificado, ou None em caso de
+        erro (status e detalhes vão para o log).
+        """
+        kwargs.setdefault('timeout', _TIMEOUT)
+        response = self.session.get(url, **kwargs)
+        if response.status_code != 200:
+            logger.error('Erro ao fazer a requisição: %s', response.status_code)
+            logger.error('Detalhes do erro: %s', response.text)
+            return None
+        return _json_loads(response)
+
+    def _post_json(self, url, payload, **kwargs):
+        """POST de um payload JSON; mesmo contrato de retorno de _get_json"""
+        kwargs.setdefault('timeout', _TIMEOUT)
+        response = self.session.post(url, data=_json_dumps(payload), **kwargs)
+        if response.status_code != 200:
+            logger.error('Erro ao fazer a requisição: %s', response.status_code)
+            logger.error('Detalhes do erro: %s', response.text)
+            return None
+        return _json_loads(response)
+
+    def _fetch_campos(self, subprograma, codigo_form, layout_code):
+        """
+        Busca (com cache) os campos de um formulário.
+
+        Returns:
+            tuple: (lista de campos, índice {nomeCampo: (ordem, tamanho,
+                   tipo)}) ou None em caso de erro na requisição
+        """
+        chave = (subprograma, codigo_form, layout_code)
+        resultado = self._campos_cache.get(chave)
+        if resultado is not None:
+            return resultado
+
+        url = f'{self.base_url}/gw/formulario/formulario/download/campos-formulario/{subprograma}/{codigo_form}/{layout_code}'
+
+        data = self._get_json(url)
+        if data is None:
+            return None
+
+        campos = data['camposFormularios']
+        # Índice por nome montado uma única vez: a busca de campo passa a
+        # ser O(1) em vez de uma varredura linear a cada consulta
+        por_nome = {campo['nomeCampo']: (campo['ordem'], campo['tamanho'], campo['tipo'])
+                    for campo in campos}
+        resultado = (campos, por_nome)
+        self._campos_cache[chave] = resultado
+        return resultado
+
+    def pegar_colunas(self, subprograma, codigo_form):
+        """Obtém a lista de colunas de um formulário (com cache)"""
+        resultado = self._fetch_campos(subprograma, codigo_form, '055')
+        if resultado is None:
             return []
+        campos, _ = resultado
+        return [campo['ordem'] for campo in campos]
     
     def exportar_payload(self, id_user, codigo_form, colunas, subprograma, fonte, 
                         filtro_op='', filtro_valor='', filtro_coluna='', 
@@ -64,109 +336,49 @@ class RepoLink:
         # Configuração base do filtro
         if filtro_op != '':
             filtro = [{
-                "operador": filtro_op,  
-                "coluna": filtro_coluna, 
+                "operador": filtro_op,
+                "coluna": filtro_coluna,
                 "tamanho": filtro_tamanho,
                 "tipoCampo": filtro_tipo,
                 "valor1": filtro_valor,
             }]
         else:
-            filtro = []
+            filtro = _FILTRO_VAZIO
         
-        # Configurações específicas para cada tipo de formulário
-        formularios_config = {
-            'L185': {
-                "servico": {"id": 15, "nome": "US"},
-                "formulario": {"codigo": "L185", "nome": "Leiaute de Usuário - v3"},
-                "layout": {"codigo": 185, "id": 170, "idServico": 15, "nomeServico": "US", "referenciaServico": "REPOSITÓRIO DE USUÁRIOS"},
-                "colunas": list(range(1, 72))
-            },
-            'L062': {
-                "servico": {"id": 15, "nome": "US"},
-                "formulario": {"codigo": "L062", "nome": "Leiaute de Controle de usuários e pontos de entrega."},
-                "layout": {"codigo": "062", "id": 190, "idServico": 15, "nomeServico": "US", "referenciaServico": "REPOSITÓRIO DE USUÁRIOS"},
-                "colunas": list(range(1, 16))
-            },
-            'L204': {
-                "servico": {"id": 6, "nome": "IN"},
-                "formulario": {"codigo": "L204", "nome": "Leiaute de Instrumento"},
-                "layout": {"codigo": "204", "id": 173, "idServico": 6, "nomeServico": "IN", "referenciaServico": "REPOSITÓRIO DE INSTRUMENTOS"},
-                "colunas": list(range(1, 42))
-            },
-            'L005': {
-                "servico": {"id": 1, "nome": "DA"},
-                "formulario": {"codigo": "L005", "nome": "Leiaute de base planejada"},
-                "layout": {"codigo": "005", "id": 5, "idServico": 1, "nomeServico": "DA", "referenciaServico": "REPOSITÓRIO DE DADOS"},
-                "colunas": list(range(1, 117)),
-                "fileNames": ["", ""]
-            },
-            'L009': {
-                "servico": {"id": 3, "nome": "SU"},
-                "formulario": {"codigo": "L009", "nome": "Leiaute de sujeito"},
-                "layout": {"codigo": "009", "id": 9, "idServico": 3, "nomeServico": "SU", "referenciaServico": "REPOSITÓRIO DE SUJEITOS"},
-                "colunas": list(range(1, 98)),
-                "fileNames": ["", ""]
-            },
-            'L008': {
-                "servico": {"id": 1, "nome": "DA"},
-                "formulario": {"codigo": "L008", "nome": "Leiaute de decodificação"},
-                "layout": {"codigo": "008", "id": 8, "idServico": 1, "nomeServico": "DA", "referenciaServico": "REPOSITÓRIO DE DADOS"},
-                "colunas": list(range(1, 227)),
-                "fileNames": ["", ""]
-            },
-            'L021': {
-                "servico": {"id": 10, "nome": "SO"},
-                "formulario": {"codigo": "L021", "nome": "Leiaute de solicitação de verificação"},
-                "layout": {"codigo": "021", "id": 17, "idServico": 10, "nomeServico": "SO", "referenciaServico": "REPOSITÓRIO DE SOLICITAÇÃO"},
-                "colunas": list(range(1, 27)),
-                "fileNames": ["", ""]
-            },
-            'L010': {
-                "servico": {"id": 10, "nome": "SO"},
-                "formulario": {"codigo": "L010", "nome": "Leiaute de solicitação de recodificação"},
-                "layout": {"codigo": "010", "id": 148, "idServico": 10, "nomeServico": "SO", "referenciaServico": "REPOSITÓRIO DE SOLICITAÇÃO"},
-                "colunas": list(range(1, 27)),
-                "fileNames": ["", ""]
-            }
-        }
-        
-        # Configuração padrão para formulários AD
-        config_padrao = {
-            "servico": {"id": 13, "nome": "AD", "referenciaServico": "REPOSITÓRIO DE DADOS ADMINISTRATIVOS", "instanciaServico": "REPOSITORIO_DADO_ADMINISTRATIVO"},
-            "formulario": {"codigo": codigo_form},
-            "layout": {"codigo": "055", "nome": "Leiaute de dado administrativo", "id": 125, "idServico": 13, "nomeServico": "AD", "referenciaServico": "REPOSITORIO_DADOS_ADMINISTRATIVOS"},
-            "colunas": colunas,
-            "fileNames": [""]
-        }
-        
-        # Seleciona a configuração apropriada
-        if codigo_form in formularios_config:
-            config = formularios_config[codigo_form]
-            file_names = config.get("fileNames", [""])
+        # Seleciona a configuração apropriada (tabelas em nível de módulo)
+        config = _FORMULARIOS_CONFIG.get(codigo_form)
+        if config is not None:
+            file_names = _FILE_NAMES_CONFIG.get(codigo_form, ("",))
+            # Materializa o range de colunas só aqui (o serializador JSON
+            # não aceita range)
+            config = dict(config, colunas=list(config["colunas"]))
         else:
-            config = config_padrao
-            file_names = [""]
-        
-        # Remove 'fileNames' do config para não duplicar
-        config = {k: v for k, v in config.items() if k != "fileNames"}
-        
+            # Configuração padrão para formulários AD
+            config = {
+                "servico": _SERVICO_AD,
+                "formulario": {"codigo": codigo_form},
+                "layout": _LAYOUT_AD,
+                "colunas": colunas
+            }
+            file_names = ("",)
+
         # Monta o payload completo
         payload = {
             "fileNames": file_names,
             "fonte": {
                 "codigo": fonte,
                 "ativo": True,
-                "fonteDadoTipo": {"id": 2, "codigo": 2},
+                "fonteDadoTipo": _FONTE_DADO_TIPO,
                 "fonteDadoPadrao": None
             },
             "programa": {
                 "codigo": subprograma,
                 "ativo": True,
-                "programaTipo": {"id": 2, "codigo": 2},
+                "programaTipo": _PROGRAMA_TIPO,
                 "fonteDado": {
                     "codigo": fonte,
                     "ativo": True,
-                    "fonteDadoTipo": {"id": 2, "codigo": 2},
+                    "fonteDadoTipo": _FONTE_DADO_TIPO,
                     "fonteDadoPadrao": None
                 },
                 "nomeArquivoEspecificacao": None,
@@ -174,7 +386,7 @@ class RepoLink:
             },
             "usuario": {
                 "id": id_user,
-                "grupoSelecionado": {"id": 1, "descricao": "ADM", "ativo": True}
+                "grupoSelecionado": _GRUPO_ADM
             },
             "transferencia": False,
             "filtrosAvancados": filtro
@@ -187,68 +399,97 @@ class RepoLink:
     
     def get_bearer_token(self, password, username):
         """Obtém token de autenticação"""
-        url = f"{self.base_url}/gw/login/auth/login"
         payload = {"username": username, "password": password}
-        headers = {"Content-Type": "application/json; charset=utf-8"}
-        
-        response = requests.post(url, json=payload, headers=headers)
+
+        response = self.session.post(self.url_login, data=_json_dumps(payload),
+                                     timeout=_TIMEOUT)
         if response.status_code == 200:
-            token = response.json().get("token")
+            token = _json_loads(response).get("token")
             return token
         else:
             raise Exception(f"Error: {response.status_code}, {response.text}")
     
+    @staticmethod
+    def _expiracao_token(token):
+        """Extrai o instante de expiração ('exp') do payload do JWT"""
+        try:
+            payload = token.split('.')[1]
+            payload = base64.urlsafe_b64decode(payload + '==')
+            return json.loads(payload).get('exp', 0)
+        except (IndexError, ValueError):
+            return 0
+
+    def _ensure_token(self, password, username):
+        """Retorna o token em cache se ainda válido; senão autentica de novo"""
+        if self.bearer and time.time() < self._token_expiry - 60:
+            return self.bearer
+
+        chave = (self.ambiente, username)
+        # O lock também deduplica renovações concorrentes: o primeiro
+        # thread autentica e os demais reutilizam o resultado
+        with _token_lock:
+            cached = _token_cache.get(chave)
+            if cached and time.time() < cached[1] - 60:
+                token, expiry = cached
+            else:
+                token = self.get_bearer_token(password, username)
+                # Usa o 'exp' real do JWT; na falta dele, assume 55 minutos
+                expiry = self._expiracao_token(token) or time.time() + 55 * 60
+                _token_cache[chave] = (token, expiry)
+
+        self.bearer = token
+        self._token_expiry = expiry
+        # Token novo: descarta metadados obtidos com o token anterior
+        self._campos_cache.clear()
+        return self.bearer
+
     def get_formulario_code(self, subprograma, id_user, partial_name):
         """Obtém o código do formulário pelo nome parcial"""
         url = f'{self.base_url}/gw/formulario/formulario/download/formularios/{subprograma}/AD/{id_user}'
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {self.bearer}'
-        }
 
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            formularios_data = response.json()
-            
-            if isinstance(formularios_data, list):
-                formularios = formularios_data
-            elif 'formularios' in formularios_data:
-                formularios = formularios_data['formularios']
-            else:
-                formularios = []
-            
-            for formulario in formularios:
-                if partial_name.upper() == formulario['nome'].upper():
-                    print(f"O código do formulário {partial_name} é: {formulario['codigo']}")
-                    return formulario['codigo'], partial_name
-            
-            print("Nenhum formulário com a parte do nome fornecida foi encontrado.")
+        formularios_data = self._get_json(url)
+        if formularios_data is None:
             return None, None
+
+        if isinstance(formularios_data, list):
+            formularios = formularios_data
+        elif 'formularios' in formularios_data:
+            formularios = formularios_data['formularios']
         else:
-            print(f'Erro ao fazer a requisição: {response.status_code}')
-            print('Detalhes do erro:', response.text)
-            return None, None
+            formularios = []
+
+        for formulario in formularios:
+            if partial_name.upper() == formulario['nome'].upper():
+                print(f"O código do formulário {partial_name} é: {formulario['codigo']}")
+                return formulario['codigo'], partial_name
+
+        logger.error('Nenhum formulário com a parte do nome fornecida foi encontrado.')
+        return None, None
     
-    def verificar_arquivo_disponivel(self, nome_arquivo_parcial, data_atual, total_items):
-        """Verifica se o arquivo está disponível para download"""
+    def verificar_arquivo_disponivel(self, nome_arquivo_parcial, data_atual, total_items=None):
+        """
+        Verifica se o arquivo está disponível para download.
+
+        total_items é aceito apenas por compatibilidade: a consulta ao
+        /historico não depende dele.
+        """
         historico_params = {
             "idGrupo": 1,
-            "ultimaSemana": data_atual, 
-            "totalItems": total_items,
+            "ultimaSemana": data_atual,
+            # Pede ao servidor só os itens do arquivo procurado; se o
+            # backend ignorar o parâmetro, o filtro local abaixo ainda vale
+            "filtroNomeArquivo": nome_arquivo_parcial,
             "page": 0,
             "size": 10,
             "sort": "id,desc"
         }
-        historico_url = f"{self.base_url}/gw/repositorio/historico"
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {self.bearer}'
-        }
-        
-        response = requests.get(historico_url, headers=headers, params=historico_params)
-        
+        response = self.session.get(self.url_historico, params=historico_params,
+                                    timeout=_TIMEOUT)
+        # Guarda a dica de espera do servidor (se houver) para o polling
+        self._retry_after = response.headers.get('Retry-After')
+
         if response.status_code == 200:
-            data = response.json()
+            data = _json_loads(response)
             for item in data.get("content", []):
                 if item["nomeArquivo"].startswith(nome_arquivo_parcial) and item["tpStatus"] == "S":
                     return item["nomeArquivo"]
@@ -256,288 +497,598 @@ class RepoLink:
     
     def get_total_items(self, data_atual):
         """Obtém o total de itens no histórico"""
-        total_items_url = f"{self.base_url}/gw/repositorio/historico/totalItems"
         params = {"idGrupo": 1, "ultimaSemana": data_atual}
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {self.bearer}'
-        }
-        
-        response = requests.get(total_items_url, headers=headers, params=params)
+
+        response = self.session.get(self.url_total_items, params=params,
+                                    timeout=_TIMEOUT)
         if response.status_code == 200:
             try:
                 return int(response.text)
             except ValueError:
-                print("Erro ao converter a resposta para inteiro.")
+                logger.error('Erro ao converter a resposta para inteiro.')
                 return None
         else:
-            print(f"Erro ao obter totalItems: {response.status_code}")
+            logger.error('Erro ao obter totalItems: %s', response.status_code)
             return None
     
     def cat_nm_campo(self, subprograma, codigo_form, campo_filtro):
-        """Obtém informações de um campo específico"""
-        # Define a URL base baseada no código do formulário
-        base_urls = {
-            'L185': '185',
-            'L062': '185',
-            'L005': '005',
-            'L009': '009',
-            'L204': '204',
-            'L008': '008',
-            'L021': '021',
-            'L010': '010'
-        }
-        
-        layout_code = base_urls.get(codigo_form, '055')
-        url = f'{self.base_url}/gw/formulario/formulario/download/campos-formulario/{subprograma}/{codigo_form}/{layout_code}'
-        
-        headers = {
-            'Content-Type': 'application/json;charset=UTF-8',
-            'Authorization': f'Bearer {self.bearer}'
-        }
-        
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            data = response.json()
-            for campo in data['camposFormularios']:
-                if campo['nomeCampo'] == campo_filtro:
-                    return campo['ordem'], campo['tamanho'], campo['tipo']
-            print(f"Campo {campo_filtro} não encontrado.")
+        """Obtém informações de um campo específico (com cache)"""
+        layout_code = _LAYOUT_MAP.get(codigo_form, '055')
+        resultado = self._fetch_campos(subprograma, codigo_form, layout_code)
+        if resultado is None:
             return None, None, None
-        else:
-            print(f'Erro ao fazer a requisição: {response.status_code}')
+
+        _, por_nome = resultado
+        info = por_nome.get(campo_filtro)
+        if info is None:
+            logger.error('Campo %s não encontrado.', campo_filtro)
             return None, None, None
-    
-    def baixa_dado_adm(self, formulario, subprograma, fonte, destino='', 
-                      filtro_coluna='', filtro_op='', filtro_valor=''):
+        return info
+
+    def _resolver_colunas(self, subprograma, codigo_form, nomes):
         """
-        Baixa formulários do repositório
-        
+        Converte nomes de campos nos índices ('ordem') usados no payload.
+
+        Returns:
+            list: índices na mesma ordem de nomes, ou None se algum campo
+                  não existir no formulário
+        """
+        layout_code = _LAYOUT_MAP.get(codigo_form, '055')
+        resultado = self._fetch_campos(subprograma, codigo_form, layout_code)
+        if resultado is None:
+            return None
+
+        _, por_nome = resultado
+        indices = []
+        for nome in nomes:
+            info = por_nome.get(nome)
+            if info is None:
+                logger.error('Campo %s não encontrado.', nome)
+                return None
+            indices.append(info[0])
+        return indices
+
+    @staticmethod
+    def _normalizar_filtro_valor(filtro_op, filtro_valor):
+        """Normaliza o valor de um filtro para o formato aceito pela API"""
+        if filtro_op == 'in':
+            # Listas já prontas não passam pelo split('|||'); map(str, ...)
+            # cobre valores numéricos sem alocação intermediária extra
+            if not isinstance(filtro_valor, list):
+                filtro_valor = filtro_valor.split('|||')
+            return '§'.join(map(str, filtro_valor))
+        if filtro_op == '=':
+            # str() nunca levanta exceção para tipos básicos
+            return str(filtro_valor)
+        return filtro_valor
+
+    def _solicitar_exportacao(self, formulario, subprograma, fonte,
+                              filtro_coluna='', filtro_op='', filtro_valor='',
+                              colunas_selecionadas=None, filtros=None):
+        """
+        Monta e envia a solicitação de exportação de um formulário.
+
         Args:
-            formulario (str): Nome do formulário a ser baixado
-            subprograma (str): Código de programa de origem da avaliação
-            fonte (str): Código fonte do programa
-            destino (str): Caminho onde fazer o download
-            filtro_coluna (str): Coluna para aplicar filtro
-            filtro_op (str): Tipo de filtro ('in', '=', etc.)
-            filtro_valor (str/list): Valor(es) para filtro
+            colunas_selecionadas (list): nomes de campos a exportar; None
+                                         exporta o leiaute completo
+            filtros (list): filtros compostos (E lógico) como tuplas
+                            (coluna, operador, valor); tem precedência
+                            sobre o trio filtro_coluna/op/valor
+
+        Returns:
+            tuple: (codigo_form, partial_name, nome_arquivo_parcial) em caso
+                   de sucesso; 0 se o formulário não foi encontrado; None
+                   em caso de erro na solicitação
         """
-        # Carrega credenciais
-        caminho_arquivo = os.path.abspath(__file__)
-        caminho_diretorio = os.path.dirname(caminho_arquivo)
-        cadastro = pd.read_csv(os.path.join(caminho_diretorio, self.acesso_file))
-        
-        id_user = str(cadastro.ID_USER.values[0])
-        password = cadastro.SENHA.values[0]
-        username = cadastro.USER.values[0]
-        
-        # Obtém token
-        self.bearer = self.get_bearer_token(password, username)
-        
-        data_atual = datetime.now().strftime('%Y-%m-%d')
-        
-        # URLs
-        solicitar_exportacao_url = f"{self.base_url}/gw/repositorio/download/solicitarExportacao"
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {self.bearer}'
-        }
-        
-        # Mapeamento de formulários especiais
-        formularios_especiais = {
-            'USUARIO': ('L185', f'FORM_{formulario}_{subprograma}', ''),
-            'APP_LOGISTICA': ('L062', 'APP_LOGISTICA', ''),
-            'L005': ('L005', 'L005', ''),
-            'L009': ('L009', 'L009', ''),
-            'L204': ('L204', 'L204', ''),
-            'L008': ('L008', 'L008', ''),
-            'L021': ('L021', 'L021', ''),
-            'L010': ('L010', 'L010', '')
-        }
-        
-        # Define código, nome parcial e colunas
-        if formulario in formularios_especiais:
-            codigo_form, partial_name, colunas = formularios_especiais[formulario]
+        # Carrega credenciais (memoizadas)
+        cadastro = self._load_credentials()[0]
+
+        id_user = str(cadastro['ID_USER'])
+        password = cadastro['SENHA']
+        username = cadastro['USER']
+
+        # Obtém token (reutiliza o cacheado enquanto não expirar)
+        self._ensure_token(password, username)
+
+        # Define código e nome parcial; as colunas dos leiautes fixos vêm
+        # de _FORMULARIOS_CONFIG, só os formulários AD consultam o servidor
+        if formulario == 'USUARIO':
+            codigo_form, partial_name = 'L185', f'FORM_{formulario}_{subprograma}'
+            colunas = None
+        elif formulario in _FORMULARIOS_ESPECIAIS:
+            codigo_form, partial_name = _FORMULARIOS_ESPECIAIS[formulario]
+            colunas = None
         else:
             partial_name = f'FORM_{formulario}_{subprograma}'
             codigo_form, partial_name = self.get_formulario_code(subprograma, id_user, partial_name)
             if not codigo_form:
-                print(f"Nenhum formulário encontrado com nome de {partial_name}.")
+                logger.error('Nenhum formulário encontrado com nome de %s.', partial_name)
                 return 0
             colunas = self.pegar_colunas(subprograma, codigo_form)
-        
+
         # Processa filtros
-        if filtro_op == 'in':
-            if not isinstance(filtro_valor, list):
-                filtro_valor = filtro_valor.split('|||')
-            filtro_valor = '§'.join(filtro_valor)
-        elif filtro_op == '=':
-            if not isinstance(filtro_valor, str):
-                try:
-                    filtro_valor = str(filtro_valor)
-                except:
-                    print("Valor do filtro inválido para operador '='")
-        
+        filtro_valor = self._normalizar_filtro_valor(filtro_op, filtro_valor)
+
         if filtro_coluna != '':
             filtro_coluna, filtro_tamanho, filtro_tipo = self.cat_nm_campo(subprograma, codigo_form, filtro_coluna)
         else:
             filtro_tamanho = ''
             filtro_tipo = ''
-        
+
         # Gera e envia payload
-        payload = self.exportar_payload(id_user, codigo_form, colunas, subprograma, fonte, 
+        payload = self.exportar_payload(id_user, codigo_form, colunas, subprograma, fonte,
                                        filtro_op, filtro_valor, filtro_coluna, filtro_tamanho, filtro_tipo)
         payload.update({"historico": False})
-        
-        response = requests.post(solicitar_exportacao_url, json=payload, headers=headers)
-        
+
+        # Filtros compostos (E lógico): um único pedido já filtrado no
+        # servidor, em vez de baixar tudo e filtrar localmente
+        if filtros:
+            avancados = []
+            for coluna, op, valor in filtros:
+                ordem, tamanho, tipo = self.cat_nm_campo(subprograma, codigo_form, coluna)
+                if ordem is None:
+                    return None
+                avancados.append({
+                    "operador": op,
+                    "coluna": ordem,
+                    "tamanho": tamanho,
+                    "tipoCampo": tipo,
+                    "valor1": self._normalizar_filtro_valor(op, valor),
+                })
+            payload["filtrosAvancados"] = avancados
+
+        # Projeção de colunas: pede ao servidor só os campos selecionados,
+        # em vez de exportar o leiaute inteiro e filtrar depois
+        if colunas_selecionadas:
+            indices = self._resolver_colunas(subprograma, codigo_form, colunas_selecionadas)
+            if indices is None:
+                return None
+            payload["colunas"] = indices
+
+        response = self.session.post(self.url_solicitar_exportacao, data=_json_dumps(payload),
+                                     timeout=_TIMEOUT)
+
         if response.status_code == 200:
-            data = response.json()
+            data = _json_loads(response)
             print(f"Solicitação de Download {partial_name.upper()} realizada com sucesso, aguarde...")
-            
+
             nome_arquivo = data.get('nomeArquivo')
             if nome_arquivo:
                 nome_arquivo_parcial = "_".join(nome_arquivo.split("_")[:-1])
-                total_items = self.get_total_items(data_atual)
-                
-                if total_items is not None:
-                    # Aguarda arquivo ficar disponível
-                    tempo_limite = 600
-                    tempo_inicial = time.time()
-                    arquivo_disponivel = None
-                    
-                    while time.time() - tempo_inicial < tempo_limite:
-                        arquivo_disponivel = self.verificar_arquivo_disponivel(nome_arquivo_parcial, data_atual, total_items)
-                        if arquivo_disponivel:
-                            break
-                        time.sleep(5)
-                    
-                    if arquivo_disponivel:
-                        # Faz download do arquivo
-                        download_url = f"{self.base_url}/gw/repositorio/download/arquivo/{arquivo_disponivel}"
-                        download_response = requests.get(download_url, headers=headers)
-                        
-                        if download_response.status_code == 200:
-                            # Define nome do arquivo
-                            mapeamento_nomes = {
-                                'L005': f"{arquivo_disponivel}_L005.zip",
-                                'L009': f"{arquivo_disponivel}_L009.zip",
-                                'L204': f"{arquivo_disponivel}_L204.zip",
-                                'L008': f"{arquivo_disponivel}_L008.zip",
-                                'L021': f"{arquivo_disponivel}_L021.zip",
-                                'L010': f"{arquivo_disponivel}_L010.zip"
-                            }
-                            
-                            file_name = mapeamento_nomes.get(codigo_form, 
-                                                           f"{arquivo_disponivel}_{partial_name[:-5].upper()}.zip".replace('FORM_', ''))
-                            
-                            # Salva arquivo
-                            destino_0 = os.getcwd()
-                            if destino:
-                                os.makedirs(destino, exist_ok=True)
-                                destino_path = os.path.join(os.getcwd(), destino)
-                                os.chdir(destino_path)
-                            
-                            with open(file_name, "wb") as f:
-                                f.write(download_response.content)
-                            print(f"Arquivo ZIP baixado com sucesso: {file_name}")
-                            
-                            # Extrai conteúdo
-                            with zipfile.ZipFile(io.BytesIO(download_response.content), 'r') as zip_ref:
-                                zip_ref.extractall(os.getcwd())
-                            print(f"Conteúdo do arquivo ZIP extraído com sucesso: {file_name}")
-                            
-                            # Renomeia arquivo CSV
-                            os.rename(arquivo_disponivel + '.csv', file_name.replace('.zip', '.csv'))
-                            os.chdir(destino_0)
-                            
-                            return os.path.join(destino if destino else '', file_name.replace('.zip', '.csv'))
-                        else:
-                            print(f"Erro ao baixar o arquivo ZIP: {download_response.status_code}")
-                            print("Detalhes:", download_response.text)
-                    else:
-                        print("Tempo limite excedido. Arquivo não disponível.")
-                else:
-                    print("Erro ao obter totalItems.")
-            else:
-                print("Nome do arquivo não encontrado na resposta.")
+                return codigo_form, partial_name, nome_arquivo_parcial
+            logger.error('Nome do arquivo não encontrado na resposta.')
         else:
-            print(f"Erro na solicitação: {response.status_code}")
+            logger.error('Erro na solicitação: %s', response.status_code)
             try:
-                error_message = response.json().get('error', 'Nenhuma mensagem de erro')
-                print("Erro:", error_message)
+                error_message = _json_loads(response).get('error', 'Nenhuma mensagem de erro')
+                logger.error('Erro: %s', error_message)
             except ValueError:
-                print("Resposta:", response.text)
-        
+                logger.error('Resposta: %s', response.text)
+
         return None
-    
+
+    def _baixar_arquivo(self, arquivo_disponivel, codigo_form, partial_name,
+                        destino='', keep_zip=False):
+        """Baixa o ZIP exportado, extrai e retorna o caminho do CSV"""
+        download_url = f"{self.base_url}/gw/repositorio/download/arquivo/{arquivo_disponivel}"
+        download_response = self.session.get(download_url, stream=True, timeout=_TIMEOUT)
+
+        if download_response.status_code != 200:
+            logger.error('Erro ao baixar o arquivo ZIP: %s', download_response.status_code)
+            logger.error('Detalhes: %s', download_response.text)
+            return None
+
+        # Define nome do arquivo
+        sufixo = _ZIP_SUFFIX_BY_FORM.get(codigo_form)
+        if sufixo:
+            file_name = f"{arquivo_disponivel}_{sufixo}.zip"
+        else:
+            file_name = f"{arquivo_disponivel}_{partial_name[:-5].upper()}.zip".replace('FORM_', '')
+
+        # Salva arquivo usando caminhos absolutos (sem os.chdir,
+        # que é global ao processo e quebra downloads concorrentes)
+        out_dir = os.path.abspath(destino) if destino else os.getcwd()
+        os.makedirs(out_dir, exist_ok=True)
+        zip_path = os.path.join(out_dir, file_name)
+
+        # Escreve em streaming direto no disco (sem carregar o ZIP na RAM)
+        with open(zip_path, "wb") as f:
+            shutil.copyfileobj(download_response.raw, f, length=1 << 20)
+        download_response.close()
+        print(f"Arquivo ZIP baixado com sucesso: {file_name}")
+
+        # Extrai cada membro em streaming, já com o nome final (o CSV nunca
+        # existe em disco com o nome temporário, dispensando o os.rename)
+        csv_path = os.path.join(out_dir, file_name.replace('.zip', '.csv'))
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            for info in zip_ref.infolist():
+                if info.is_dir():
+                    continue
+                if info.filename.endswith('.csv'):
+                    caminho_membro = csv_path
+                else:
+                    caminho_membro = os.path.join(out_dir, os.path.basename(info.filename))
+                with zip_ref.open(info) as origem, open(caminho_membro, 'wb') as membro:
+                    shutil.copyfileobj(origem, membro, length=1 << 20)
+        print(f"Conteúdo do arquivo ZIP extraído com sucesso: {file_name}")
+
+        # O ZIP já cumpriu seu papel; só permanece em disco a pedido
+        if not keep_zip:
+            os.unlink(zip_path)
+
+        return csv_path
+
+    def baixa_dado_adm(self, formulario, subprograma, fonte, destino='',
+                      filtro_coluna='', filtro_op='', filtro_valor='',
+                      colunas_selecionadas=None, keep_zip=False, filtros=None):
+        """
+        Baixa formulários do repositório
+
+        Args:
+            formulario (str): Nome do formulário a ser baixado
+            subprograma (str): Código de programa de origem da avaliação
+            fonte (str): Código fonte do programa
+            destino (str): Caminho onde fazer o download
+            filtro_coluna (str): Coluna para aplicar filtro
+            filtro_op (str): Tipo de filtro ('in', '=', etc.)
+            filtro_valor (str/list): Valor(es) para filtro
+            colunas_selecionadas (list): nomes de campos a exportar; None
+                                         exporta o leiaute completo
+            keep_zip (bool): mantém o ZIP baixado em disco após a extração
+            filtros (list): filtros compostos (E lógico) como tuplas
+                            (coluna, operador, valor)
+        """
+        solicitacao = self._solicitar_exportacao(formulario, subprograma, fonte,
+                                                 filtro_coluna, filtro_op, filtro_valor,
+                                                 colunas_selecionadas, filtros)
+        if solicitacao == 0:
+            return 0
+        if not solicitacao:
+            return None
+        codigo_form, partial_name, nome_arquivo_parcial = solicitacao
+
+        data_atual = datetime.now().strftime('%Y-%m-%d')
+
+        # Aguarda arquivo ficar disponível
+        tempo_limite = 600
+        tempo_inicial = time.time()
+        arquivo_disponivel = None
+        espera = 1.0
+
+        while time.time() - tempo_inicial < tempo_limite:
+            arquivo_disponivel = self.verificar_arquivo_disponivel(nome_arquivo_parcial, data_atual)
+            if arquivo_disponivel:
+                break
+            espera = self._aguardar_proxima_consulta(espera)
+
+        if not arquivo_disponivel:
+            logger.error('Tempo limite excedido. Arquivo não disponível.')
+            return None
+
+        return self._baixar_arquivo(arquivo_disponivel, codigo_form, partial_name,
+                                    destino, keep_zip)
+
+    def _aguardar_proxima_consulta(self, espera):
+        """
+        Dorme até a próxima consulta ao /historico e devolve a nova espera.
+
+        Respeita a dica Retry-After do servidor quando presente; senão usa
+        backoff exponencial com jitter (1 s → 15 s, fator 1,5, ±20%).
+        """
+        if self._retry_after and str(self._retry_after).isdigit():
+            time.sleep(int(self._retry_after))
+            return espera
+        time.sleep(espera * random.uniform(0.8, 1.2))
+        return min(espera * 1.5, 15.0)
+
+    def _verificar_disponiveis(self, pendentes, data_atual):
+        """
+        Uma única consulta ao /historico cobrindo todos os arquivos pendentes.
+
+        Args:
+            pendentes: iterável de nomes parciais ainda aguardados
+
+        Returns:
+            dict: {nome_arquivo_parcial: nomeArquivo} dos que ficaram prontos
+        """
+        historico_params = {
+            "idGrupo": 1,
+            "ultimaSemana": data_atual,
+            "page": 0,
+            "size": 50,
+            "sort": "id,desc"
+        }
+        response = self.session.get(self.url_historico, params=historico_params,
+                                    timeout=_TIMEOUT)
+        self._retry_after = response.headers.get('Retry-After')
+
+        prontos = {}
+        if response.status_code == 200:
+            data = _json_loads(response)
+            for item in data.get("content", []):
+                if item["tpStatus"] != "S":
+                    continue
+                for parcial in pendentes:
+                    if parcial not in prontos and item["nomeArquivo"].startswith(parcial):
+                        prontos[parcial] = item["nomeArquivo"]
+                        break
+        return prontos
+
+    def baixa_muitos(self, pedidos, tempo_limite=600, max_workers=4):
+        """
+        Baixa vários formulários com um único loop de polling.
+
+        Envia todas as solicitações de exportação primeiro e consulta o
+        /historico uma vez por iteração para todos os arquivos pendentes,
+        em vez de N loops de polling independentes (N×120 → ~120 chamadas).
+        Arquivos que ficam prontos juntos são baixados em paralelo.
+
+        Args:
+            pedidos (list): lista de dicts com os argumentos de baixa_dado_adm
+                            (formulario, subprograma, fonte, destino, ...)
+            tempo_limite (int): tempo máximo de espera em segundos
+            max_workers (int): número máximo de downloads simultâneos
+
+        Returns:
+            list: caminho do CSV baixado (ou None) na mesma ordem de pedidos
+        """
+        resultados = [None] * len(pedidos)
+        pendentes = {}  # nome_arquivo_parcial -> (índice, codigo_form, partial_name, destino)
+
+        for i, pedido in enumerate(pedidos):
+            solicitacao = self._solicitar_exportacao(
+                pedido['formulario'], pedido['subprograma'], pedido['fonte'],
+                pedido.get('filtro_coluna', ''), pedido.get('filtro_op', ''),
+                pedido.get('filtro_valor', ''), pedido.get('colunas_selecionadas'),
+                pedido.get('filtros'))
+            if solicitacao == 0:
+                resultados[i] = 0
+            elif solicitacao:
+                codigo_form, partial_name, parcial = solicitacao
+                if parcial in pendentes:
+                    # Dois pedidos com o mesmo nome parcial (mesmo
+                    # formulário/subprograma com filtros diferentes) são
+                    # ambíguos no /historico: o mesmo arquivo casaria com
+                    # ambos. Falha explícita em vez de sobrescrever o
+                    # primeiro e deixá-lo sem download
+                    logger.error('Pedido %d repete o nome parcial %s de outro pedido '
+                                 'do lote; baixe-o em separado com baixa_dado_adm.',
+                                 i, parcial)
+                    continue
+                pendentes[parcial] = (i, codigo_form, partial_name,
+                                      pedido.get('destino', ''), pedido.get('keep_zip', False))
+
+        data_atual = datetime.now().strftime('%Y-%m-%d')
+        tempo_inicial = time.time()
+        espera = 1.0
+
+        while pendentes and time.time() - tempo_inicial < tempo_limite:
+            prontos = self._verificar_disponiveis(pendentes, data_atual)
+            if prontos:
+                # O GIL é liberado durante o I/O: baixa em paralelo os
+                # arquivos que ficaram prontos na mesma consulta
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    tarefas = []
+                    for parcial, nome_arquivo in prontos.items():
+                        i, codigo_form, partial_name, destino, keep_zip = pendentes.pop(parcial)
+                        tarefas.append((i, executor.submit(
+                            self._baixar_arquivo, nome_arquivo, codigo_form,
+                            partial_name, destino, keep_zip)))
+                    for i, tarefa in tarefas:
+                        resultados[i] = tarefa.result()
+            if not pendentes:
+                break
+            espera = self._aguardar_proxima_consulta(espera)
+
+        if pendentes:
+            logger.error('Tempo limite excedido. Arquivos não disponíveis: %s', ', '.join(pendentes))
+
+        return resultados
+
     def consulta_cadastro(self):
         """Consulta o cadastro de usuário"""
-        caminho_arquivo = os.path.abspath(__file__)
-        caminho_diretorio = os.path.dirname(caminho_arquivo)
-        return pd.read_csv(os.path.join(caminho_diretorio, self.acesso_file))
-    
+        # pd.read_csv mantém a inferência de tipos do retorno público
+        # (ID_USER numérico); o cache de csv.DictReader fica restrito ao
+        # uso interno de credenciais, onde tudo é string
+        return pd.read_csv(self._arquivo_acesso())
+
     def edita_cadastro(self, novo_cadastro):
         """Edita o cadastro de usuário"""
-        caminho_arquivo = os.path.abspath(__file__)
-        caminho_diretorio = os.path.dirname(caminho_arquivo)
-        arquivo_acesso = os.path.join(caminho_diretorio, self.acesso_file)
-        
-        old = pd.read_csv(arquivo_acesso)
-        
-        if list(old.columns) != list(novo_cadastro.columns):
+        arquivo_acesso = self._arquivo_acesso()
+
+        # Só o cabeçalho interessa para validar as colunas
+        with open(arquivo_acesso, newline='') as f:
+            cabecalho = next(csv.reader(f))
+
+        if cabecalho != list(novo_cadastro.columns):
             return 'Erro! Colunas do novo cadastro inválidas. Conferir cadastro.'
-        
+
         novo_cadastro.to_csv(arquivo_acesso, index=False)
+        # Invalida o cache para a próxima leitura pegar o arquivo novo
+        RepoLink._cred_cache.pop(arquivo_acesso, None)
         return 'Alteração de cadastro realizada com sucesso!'
     
     @staticmethod
     def base36_encode(number):
         """Codifica um número em base 36"""
-        alphabet = '0123456789abcdefghijklmnopqrstuvwxyz'
         if number == 0:
-            return alphabet[0]
-        base36 = []
+            return _BASE36_ALFABETO[0]
+        # Processa dois dígitos por divmod via tabela de pares pré-computada
+        partes = []
         while number:
-            number, i = divmod(number, 36)
-            base36.append(alphabet[i])
-        return ''.join(reversed(base36))
-    
+            number, r = divmod(number, 1296)
+            partes.append(_BASE36_PARES[r])
+        resultado = ''.join(reversed(partes))
+        # O par mais significativo pode trazer um zero à esquerda
+        return resultado.lstrip('0') or '0'
+
     @staticmethod
     def gerar_codigo_unico(tamanho=12):
         """Gera um código único em base 36"""
-        unique_id = uuid.uuid4()
-        unique_number = unique_id.int
-        base36_str = RepoLink.base36_encode(unique_number)
-        
+        if tamanho <= 12:
+            # 2**62 < 36**12: 62 bits de entropia bastam para 12 caracteres,
+            # e divmod de 1 palavra é bem mais barato que o de 128 bits.
+            # token_bytes vai direto ao gerador do SO, sem o objeto UUID
+            n = int.from_bytes(secrets.token_bytes(8), 'big') & ((1 << 62) - 1)
+            codigo = []
+            for _ in range(tamanho):
+                n, r = divmod(n, 36)
+                codigo.append(_BASE36_ALFABETO[r])
+            return ''.join(reversed(codigo))
+
+        base36_str = RepoLink.base36_encode(int.from_bytes(secrets.token_bytes(16), 'big'))
+
         if len(base36_str) > tamanho:
             return base36_str[:tamanho]
         else:
             return base36_str.zfill(tamanho)
-    
+
+    @staticmethod
+    def gerar_codigos_unicos(n, tamanho=12):
+        """
+        Gera vários códigos únicos em base 36 de uma vez.
+
+        Uma única leitura do gerador do SO alimenta todos os códigos,
+        amortizando a syscall em relação a chamar gerar_codigo_unico
+        em loop.
+
+        Args:
+            n (int): quantidade de códigos
+            tamanho (int): comprimento de cada código
+
+        Returns:
+            list: n códigos em base 36
+        """
+        if n <= 0:
+            return []
+
+        if tamanho <= 12:
+            # 8 bytes por código alimentam o caminho rápido de 62 bits
+            bruto = secrets.token_bytes(8 * n)
+            codigos = []
+            for i in range(0, 8 * n, 8):
+                num = int.from_bytes(bruto[i:i + 8], 'big') & ((1 << 62) - 1)
+                codigo = []
+                for _ in range(tamanho):
+                    num, r = divmod(num, 36)
+                    codigo.append(_BASE36_ALFABETO[r])
+                codigos.append(''.join(reversed(codigo)))
+            return codigos
+
+        bruto = secrets.token_bytes(16 * n)
+        codigos = []
+        for i in range(0, 16 * n, 16):
+            base36_str = RepoLink.base36_encode(int.from_bytes(bruto[i:i + 16], 'big'))
+            if len(base36_str) > tamanho:
+                codigos.append(base36_str[:tamanho])
+            else:
+                codigos.append(base36_str.zfill(tamanho))
+        return codigos
+
     @staticmethod
     def cpf_validator(cpf):
         """Valida se um CPF é válido"""
-        cpf_str = str(cpf)
-        numeros = [int(digito) for digito in cpf_str if digito.isdigit()]
-        
-        if len(numeros) != 11:
+        digitos = str(cpf).translate(_NAO_DIGITOS)
+        if not digitos.isascii():
+            # Separadores fora do Latin-1 (ex.: travessão) escapam da
+            # tabela; remove o que sobrou de não numérico
+            digitos = ''.join(c for c in digitos if '0' <= c <= '9')
+
+        if len(digitos) != 11:
             return False
-        
-        # Valida primeiro dígito verificador
-        soma = sum(a * b for a, b in zip(numeros[0:9], range(10, 1, -1)))
-        digito_esperado = (soma * 10 % 11) % 10
-        if numeros[9] != digito_esperado:
+
+        # CPFs com os 11 dígitos iguais passam no mod-11, mas são
+        # inválidos por definição; rejeita antes da aritmética
+        if digitos == digitos[0] * 11:
             return False
-        
+
+        # bytes indexa direto nos códigos ASCII, sem lista intermediária;
+        # o deslocamento de 48 sai da soma de uma vez (48 × soma dos pesos)
+        numeros = digitos.encode()
+
+        # Valida primeiro dígito verificador (soma desenrolada, sem generator)
+        soma = (numeros[0] * 10 + numeros[1] * 9 + numeros[2] * 8 +
+                numeros[3] * 7 + numeros[4] * 6 + numeros[5] * 5 +
+                numeros[6] * 4 + numeros[7] * 3 + numeros[8] * 2) - 2592
+        if numeros[9] - 48 != (soma * 10 % 11) % 10:
+            return False
+
         # Valida segundo dígito verificador
-        soma = sum(a * b for a, b in zip(numeros[0:10], range(11, 1, -1)))
-        digito_esperado = (soma * 10 % 11) % 10
-        if numeros[10] != digito_esperado:
+        soma = (numeros[0] * 11 + numeros[1] * 10 + numeros[2] * 9 +
+                numeros[3] * 8 + numeros[4] * 7 + numeros[5] * 6 +
+                numeros[6] * 5 + numeros[7] * 4 + numeros[8] * 3 +
+                numeros[9] * 2) - 3120
+        if numeros[10] - 48 != (soma * 10 % 11) % 10:
             return False
-        
+
         return True
-    
+
+    @staticmethod
+    def cpf_validator_batch(cpfs):
+        """
+        Valida vários CPFs de uma vez (vetorizado com NumPy).
+
+        Espera CPFs já normalizados em 11 dígitos (str ou int, sem
+        pontuação); entradas fora desse formato são marcadas inválidas.
+
+        Args:
+            cpfs: sequência ou array de CPFs
+
+        Returns:
+            np.ndarray de bool com a validade de cada CPF, na mesma ordem
+        """
+        arr = np.asarray(cpfs)
+        if arr.size == 0:
+            return np.zeros(0, dtype=bool)
+
+        # astype('S11') truncaria entradas mais longas (validando só o
+        # prefixo); mede o comprimento antes para marcá-las inválidas
+        if arr.dtype.kind == 'S':
+            bytes_arr = arr
+        else:
+            # 'replace' troca caracteres não ASCII por '?', que reprova no
+            # teste de dígitos abaixo, em vez de estourar UnicodeEncodeError
+            # na conversão para bytes
+            bytes_arr = np.char.encode(arr.astype('U'), 'ascii', 'replace')
+        tamanho_ok = np.char.str_len(bytes_arr) == 11
+
+        bruto = np.frombuffer(bytes_arr.astype('S11').tobytes(), dtype=np.uint8).reshape(-1, 11)
+        validos = tamanho_ok & ((bruto >= ord('0')) & (bruto <= ord('9'))).all(axis=1)
+        # Dígitos todos iguais passam no mod-11, mas são inválidos por definição
+        validos &= ~(bruto == bruto[:, :1]).all(axis=1)
+
+        digitos = (bruto - ord('0')).astype(np.int32)
+        d1 = (digitos[:, :9] @ _CPF_PESOS_NP1) * 10 % 11 % 10
+        d2 = (digitos[:, :10] @ _CPF_PESOS_NP2) * 10 % 11 % 10
+
+        return validos & (digitos[:, 9] == d1) & (digitos[:, 10] == d2)
+
+    @staticmethod
+    def cpf_validator_series(cpfs):
+        """
+        Valida uma pd.Series de CPFs (vetorizado com NumPy).
+
+        Aceita CPFs com ou sem pontuação: remove tudo que não for dígito
+        antes de validar. Entradas nulas ou que não resultem em 11
+        dígitos são marcadas inválidas.
+
+        Args:
+            cpfs (pd.Series): série de CPFs (str ou int)
+
+        Returns:
+            pd.Series de bool com o mesmo índice da entrada
+        """
+        limpos = cpfs.astype(str).str.replace(r'\D', '', regex=True)
+        resultado = pd.Series(False, index=cpfs.index)
+        # O \D do pandas é Unicode: dígitos de largura total ('５') passam
+        # pelo strip; só dígitos ASCII contam como CPF, como no validador
+        # escalar
+        mask = (limpos.str.len() == 11) & limpos.map(str.isascii)
+        if mask.any():
+            resultado[mask] = RepoLink.cpf_validator_batch(limpos[mask].to_numpy())
+        return resultado
+
+
     def generate_payload(self, nome, email, cpf, dc_senha, agregados, layout, key, fonte, programa, fl_master='0', op='I'):
         """EM CONSTRUÇÃO - Gera payload para cadastro de usuários"""
         return "EM CONSTRUÇÃO"
@@ -548,7 +1099,7 @@ class RepoLink:
 
 
 # Funções de conveniência para compatibilidade com código existente
-def baixa_dado_adm(formulario, subprograma, fonte, destino='', filtro_coluna='', filtro_op='', filtro_valor='', ambiente='central'):
+def baixa_dado_adm(formulario, subprograma, fonte, destino='', filtro_coluna='', filtro_op='', filtro_valor='', ambiente='central', colunas_selecionadas=None, keep_zip=False, filtros=None):
     """
     Função de conveniência para compatibilidade com código existente
     
@@ -556,7 +1107,18 @@ def baixa_dado_adm(formulario, subprograma, fonte, destino='', filtro_coluna='',
         ambiente (str): 'central' ou 'cpd'
     """
     repo = RepoLink(ambiente=ambiente)
-    return repo.baixa_dado_adm(formulario, subprograma, fonte, destino, filtro_coluna, filtro_op, filtro_valor)
+    return repo.baixa_dado_adm(formulario, subprograma, fonte, destino, filtro_coluna, filtro_op, filtro_valor, colunas_selecionadas, keep_zip, filtros)
+
+def baixa_muitos(pedidos, tempo_limite=600, max_workers=4, ambiente='central'):
+    """
+    Baixa vários formulários com um único loop de polling
+    (ver RepoLink.baixa_muitos)
+
+    Args:
+        ambiente (str): 'central' ou 'cpd'
+    """
+    repo = RepoLink(ambiente=ambiente)
+    return repo.baixa_muitos(pedidos, tempo_limite=tempo_limite, max_workers=max_workers)
 
 def consulta_cadastro(ambiente='central'):
     """Consulta cadastro do ambiente especificado"""
@@ -572,6 +1134,18 @@ def cpf_validator(cpf):
     """Valida CPF (função estática)"""
     return RepoLink.cpf_validator(cpf)
 
+def cpf_validator_batch(cpfs):
+    """Valida vários CPFs de uma vez (função estática)"""
+    return RepoLink.cpf_validator_batch(cpfs)
+
+def cpf_validator_series(cpfs):
+    """Valida uma pd.Series de CPFs (função estática)"""
+    return RepoLink.cpf_validator_series(cpfs)
+
 def gerar_codigo_unico(tamanho=12):
     """Gera código único (função estática)"""
-    return RepoLink.gerar_codigo_unico(tamanho)
\ No newline at end of file
+    return RepoLink.gerar_codigo_unico(tamanho)
+
+def gerar_codigos_unicos(n, tamanho=12):
+    """Gera vários códigos únicos de uma vez (função estática)"""
+    return RepoLink.gerar_codigos_unicos(n, tamanho)
\ No newline at end of file